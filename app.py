@@ -3,7 +3,12 @@ Main Flask application
 Webhook handler for Bitrix24 document processing
 """
 import os
+import threading
+import orjson
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -15,17 +20,49 @@ from utils.logger import setup_logger
 # Load environment variables
 load_dotenv()
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Setup logger
 logger = setup_logger("FlaskApp", level=os.getenv("LOG_LEVEL", "INFO"))
 
+# Bitrix24 deal fields (read once at startup)
+FILE_FIELD = os.getenv("BITRIX_DEAL_FILE_FIELD", "UF_CRM_1765540040027")
+RESULT_FIELD = os.getenv("BITRIX_DEAL_RESULT_FIELD", "UF_CRM_1765540114644")
+
 # Initialize clients
 bitrix_client = BitrixClient()
 azure_client = AzureDocumentIntelligence()
 
+# Prime TLS connections and the OAuth token without delaying startup
+threading.Thread(target=bitrix_client.warm_up, daemon=True).start()
+
+# Parser keeps no per-document state, so one instance serves all requests
+parser = IncomeStatementParser()
+parser.warm_up()
+
+# Recent results by (deal_id, Bitrix file id): Bitrix redeliveries and double
+# clicks reuse them, while a newly uploaded file is processed again
+_result_cache = TTLCache(maxsize=1024, ttl=int(os.getenv("RESULT_CACHE_TTL", 300)))
+_in_progress = set()
+_result_cache_lock = threading.Lock()
+
+# Webhooks are acknowledged immediately and processed here
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PROCESSING_WORKERS", 8)))
+
 
 @app.route('/', methods=['GET'])
 def health_check():
@@ -37,6 +74,144 @@ def health_check():
     })
 
 
+def _get_deal_id():
+    """
+    Read deal_id from URL parameter or JSON body
+
+    Returns:
+        (deal_id, None) on success or (None, error response) on failure
+    """
+    # Try to get deal_id from URL parameter first
+    deal_id = request.args.get('deal_id')
+
+    # If not in URL, try JSON body
+    if not deal_id:
+        data = request.get_json(silent=True)
+        if data:
+            deal_id = data.get("deal_id")
+
+    if not deal_id:
+        logger.error("Missing deal_id parameter")
+        return None, (jsonify({
+            "success": False,
+            "error": "Missing deal_id parameter. Use ?deal_id=123 or JSON body"
+        }), 400)
+
+    # Convert to int
+    try:
+        return int(deal_id), None
+    except ValueError:
+        return None, (jsonify({
+            "success": False,
+            "error": "deal_id must be a number"
+        }), 400)
+
+
+def _parse_and_save(deal_id: int, azure_result):
+    """
+    Parse Azure DI result and save it to the Bitrix24 deal
+
+    Returns:
+        Parsed data dictionary
+    """
+    # Step 3: Parse the result
+    logger.info("Step 3: Parsing document")
+    parsed_data = parser.parse(azure_result)
+
+    # Step 4: Format for Bitrix
+    logger.info("Step 4: Formatting results for Bitrix24")
+    html_output = parser.format_for_bitrix(parsed_data)
+    json_output = parser.to_json(parsed_data)
+
+    # Step 5: Save to Bitrix24
+    logger.info("Step 5: Saving results to Bitrix24")
+
+    # Save JSON to result field and add HTML table to timeline in one batch
+    bitrix_client.batch({
+        "update": ("crm.deal.update", {
+            "id": deal_id,
+            "fields": {RESULT_FIELD: json_output}
+        }),
+        "comment": ("crm.timeline.comment.add", {
+            "fields": {
+                "ENTITY_ID": deal_id,
+                "ENTITY_TYPE": "deal",
+                "COMMENT": html_output
+            }
+        })
+    })
+
+    logger.info("Processing completed successfully")
+    return parsed_data
+
+
+def _report_error(deal_id, error: Exception):
+    """Try to add processing error to the deal timeline"""
+    try:
+        if deal_id is not None:
+            error_html = f"<p style='color: red;'><strong>Помилка обробки документа:</strong><br>{str(error)}</p>"
+            bitrix_client.add_timeline_comment(deal_id, error_html)
+    except:
+        pass
+
+
+def _process_deal(deal_id: int) -> dict:
+    """
+    Run the full pipeline for one deal
+
+    A file of the deal processed within RESULT_CACHE_TTL seconds is not
+    processed (and commented on) again; its previous result is returned
+
+    Returns:
+        JSON-serializable response data
+    """
+    logger.info("Processing income statement for deal %s", deal_id)
+
+    # Step 1: Download file from Bitrix24 field
+    logger.info("Step 1: Downloading file from Bitrix24")
+    file_info = bitrix_client.get_field_file(deal_id, FILE_FIELD)
+
+    cache_key = (deal_id, file_info.get("id")) if file_info.get("id") else None
+    if cache_key:
+        with _result_cache_lock:
+            cached = _result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("File %s of deal %s was processed recently, skipping", cache_key[1], deal_id)
+            return cached
+
+    with bitrix_client.download_file(file_info) as file_content:
+        # Step 2: Analyze with Azure DI
+        logger.info("Step 2: Analyzing document with Azure DI")
+        azure_result = azure_client.analyze_document(file_content, model_id="prebuilt-layout", include=("tables",))
+
+    parsed_data = _parse_and_save(deal_id, azure_result)
+
+    response_data = {
+        "success": True,
+        "deal_id": deal_id,
+        "message": "Document processed successfully",
+        "summary": parsed_data.get("summary", {})
+    }
+
+    if cache_key:
+        with _result_cache_lock:
+            _result_cache[cache_key] = response_data
+
+    return response_data
+
+
+def _do_process(deal_id: int):
+    """Background job: run the pipeline, report errors to timeline"""
+    try:
+        _process_deal(deal_id)
+    except Exception as e:
+        logger.error("Error processing document for deal %s: %s", deal_id, e, exc_info=True)
+        _report_error(deal_id, e)
+    finally:
+        with _result_cache_lock:
+            _in_progress.discard(deal_id)
+
+
 @app.route('/webhook/process-income-statement', methods=['POST', 'GET'])
 def process_income_statement():
     """
@@ -46,85 +221,219 @@ def process_income_statement():
     1. URL parameter: ?deal_id=123
     2. JSON body: {"deal_id": 123}
 
+    The document is processed in the background and the response is 202;
+    results and errors are written to the deal as before. Calls while the
+    deal is still queued are not queued again, and a file already processed
+    within RESULT_CACHE_TTL seconds is not processed again (a newly uploaded
+    file always is).
+
     Returns:
         JSON response with status
     """
+    deal_id = None
     try:
-        # Try to get deal_id from URL parameter first
-        deal_id = request.args.get('deal_id')
+        deal_id, error_response = _get_deal_id()
+        if error_response:
+            return error_response
 
-        # If not in URL, try JSON body
-        if not deal_id:
-            data = request.get_json()
-            if data:
-                deal_id = data.get("deal_id")
+        with _result_cache_lock:
+            duplicate = deal_id in _in_progress
+            if not duplicate:
+                _in_progress.add(deal_id)
 
-        if not deal_id:
-            logger.error("Missing deal_id parameter")
+        if duplicate:
+            logger.info("Deal %s is already being processed", deal_id)
             return jsonify({
-                "success": False,
-                "error": "Missing deal_id parameter. Use ?deal_id=123 or JSON body"
-            }), 400
+                "success": True,
+                "deal_id": deal_id,
+                "queued": True,
+                "message": "Document is already being processed"
+            }), 202
 
-        # Convert to int
         try:
-            deal_id = int(deal_id)
-        except ValueError:
-            return jsonify({
-                "success": False,
-                "error": "deal_id must be a number"
-            }), 400
+            _executor.submit(_do_process, deal_id)
+        except Exception:
+            with _result_cache_lock:
+                _in_progress.discard(deal_id)
+            raise
 
-        logger.info(f"Processing income statement for deal {deal_id}")
+        logger.info("Deal %s queued for processing", deal_id)
+        return jsonify({
+            "success": True,
+            "deal_id": deal_id,
+            "queued": True,
+            "message": "Document queued for processing"
+        }), 202
 
-        # Step 1: Download file from Bitrix24 field
-        logger.info("Step 1: Downloading file from Bitrix24")
-        file_field = os.getenv("BITRIX_DEAL_FILE_FIELD", "UF_CRM_1765540040027")
-        file_content = bitrix_client.download_file_from_field(deal_id, file_field)
+    except Exception as e:
+        logger.error("Error queueing document: %s", e, exc_info=True)
+        _report_error(deal_id, e)
 
-        # Step 2: Analyze with Azure DI
-        logger.info("Step 2: Analyzing document with Azure DI")
-        azure_result = azure_client.analyze_document(file_content, model_id="prebuilt-layout")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
-        # Step 3: Parse the result
-        logger.info("Step 3: Parsing document")
-        parser = IncomeStatementParser()
-        parsed_data = parser.parse(azure_result)
 
-        # Step 4: Format for Bitrix
-        logger.info("Step 4: Formatting results for Bitrix24")
-        html_output = parser.format_for_bitrix(parsed_data)
-        json_output = parser.to_json(parsed_data)
+@app.route('/webhook/income-statement/start', methods=['POST', 'GET'])
+def start_income_statement():
+    """
+    Start income statement analysis without waiting for Azure DI
 
-        # Step 5: Save to Bitrix24
-        logger.info("Step 5: Saving results to Bitrix24")
+    Accepts deal_id the same way as /webhook/process-income-statement.
+    The caller polls /webhook/income-statement/status with the returned
+    operation token; no worker is held while Azure processes the document.
 
-        # Save JSON to result field
-        result_field = os.getenv("BITRIX_DEAL_RESULT_FIELD", "UF_CRM_1765540114644")
-        bitrix_client.update_deal_field(deal_id, result_field, json_output)
+    Repeated calls for the same deal file within RESULT_CACHE_TTL seconds
+    return the same operation token, and calls while the analysis is being
+    started report "starting" without a token, so one file starts one
+    Azure operation.
 
-        # Add HTML table to timeline
-        bitrix_client.add_timeline_comment(deal_id, html_output)
+    Returns:
+        JSON response with operation token
+    """
+    deal_id = None
+    try:
+        deal_id, error_response = _get_deal_id()
+        if error_response:
+            return error_response
+
+        file_info = bitrix_client.get_field_file(deal_id, FILE_FIELD)
+
+        busy_key = ("start", deal_id)
+        cache_key = ("start", deal_id, file_info.get("id")) if file_info.get("id") else None
+        with _result_cache_lock:
+            cached = _result_cache.get(cache_key) if cache_key else None
+            busy = cached is None and busy_key in _in_progress
+            if cached is None and not busy:
+                _in_progress.add(busy_key)
+
+        if cached is not None:
+            logger.info("Analysis for deal %s was started recently, returning its operation", deal_id)
+            return jsonify(cached), 202
+
+        if busy:
+            logger.info("Analysis for deal %s is already being started", deal_id)
+            return jsonify({
+                "success": True,
+                "deal_id": deal_id,
+                "status": "starting",
+                "message": "Analysis is already being started"
+            }), 202
 
-        logger.info("Processing completed successfully")
+        try:
+            logger.info("Starting income statement analysis for deal %s", deal_id)
+
+            with bitrix_client.download_file(file_info) as file_content:
+                operation = azure_client.start_analysis(file_content, model_id="prebuilt-layout",
+                                                        include=("tables",))
+
+            response_data = {
+                "success": True,
+                "deal_id": deal_id,
+                "status": "running",
+                "operation": operation
+            }
+            if cache_key:
+                with _result_cache_lock:
+                    _result_cache[cache_key] = response_data
+        finally:
+            with _result_cache_lock:
+                _in_progress.discard(busy_key)
+
+        return jsonify(response_data), 202
+
+    except Exception as e:
+        logger.error("Error starting analysis: %s", e, exc_info=True)
+        _report_error(deal_id, e)
 
         return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+
+@app.route('/webhook/income-statement/status', methods=['POST', 'GET'])
+def income_statement_status():
+    """
+    Check analysis started by /webhook/income-statement/start
+
+    When Azure DI has finished, the result is parsed and saved to the deal.
+    Polls for the same operation within RESULT_CACHE_TTL seconds after that
+    return the saved summary, and polls while it is being saved report
+    "running", so the deal gets one timeline comment per operation.
+
+    Expected parameters (URL or JSON body):
+        deal_id: Deal ID
+        operation: Operation token returned by the start endpoint
+
+    Returns:
+        JSON response with status
+    """
+    deal_id = None
+    try:
+        deal_id, error_response = _get_deal_id()
+        if error_response:
+            return error_response
+
+        operation = request.args.get('operation')
+        if not operation:
+            data = request.get_json(silent=True)
+            if data:
+                operation = data.get("operation")
+
+        if not operation:
+            return jsonify({
+                "success": False,
+                "error": "Missing operation parameter"
+            }), 400
+
+        cache_key = (deal_id, operation)
+        with _result_cache_lock:
+            cached = _result_cache.get(cache_key)
+            busy = cached is None and cache_key in _in_progress
+            if cached is None and not busy:
+                _in_progress.add(cache_key)
+
+        if cached is not None:
+            logger.info("Operation for deal %s was saved recently, returning cached result", deal_id)
+            return jsonify(cached)
+
+        running = jsonify({
             "success": True,
             "deal_id": deal_id,
-            "message": "Document processed successfully",
-            "summary": parsed_data.get("summary", {})
-        })
+            "status": "running"
+        }), 202
 
-    except Exception as e:
-        logger.error(f"Error processing document: {e}", exc_info=True)
+        if busy:
+            return running
 
-        # Try to add error to timeline
+        response_data = None
         try:
-            if 'deal_id' in locals():
-                error_html = f"<p style='color: red;'><strong>Помилка обробки документа:</strong><br>{str(e)}</p>"
-                bitrix_client.add_timeline_comment(deal_id, error_html)
-        except:
-            pass
+            azure_result = azure_client.get_analysis_result(operation, include=("tables",))
+            if azure_result is None:
+                return running
+
+            parsed_data = _parse_and_save(deal_id, azure_result)
+
+            response_data = {
+                "success": True,
+                "deal_id": deal_id,
+                "status": "succeeded",
+                "message": "Document processed successfully",
+                "summary": parsed_data.get("summary", {})
+            }
+        finally:
+            with _result_cache_lock:
+                if response_data is not None:
+                    _result_cache[cache_key] = response_data
+                _in_progress.discard(cache_key)
+
+        return jsonify(response_data)
+
+    except Exception as e:
+        logger.error("Error checking analysis status: %s", e, exc_info=True)
+        _report_error(deal_id, e)
 
         return jsonify({
             "success": False,
@@ -156,7 +465,7 @@ def process_document():
 
         document_type = data.get("document_type", "income_statement")
 
-        logger.info(f"Processing document of type: {document_type}")
+        logger.info("Processing document of type: %s", document_type)
 
         # Route to appropriate parser
         if document_type == "income_statement":
@@ -168,7 +477,7 @@ def process_document():
             }), 400
 
     except Exception as e:
-        logger.error(f"Error in generic processor: {e}", exc_info=True)
+        logger.error("Error in generic processor: %s", e, exc_info=True)
         return jsonify({
             "success": False,
             "error": str(e)
@@ -187,7 +496,7 @@ def not_found(error):
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
-    logger.error(f"Internal server error: {error}")
+    logger.error("Internal server error: %s", error)
     return jsonify({
         "success": False,
         "error": "Internal server error"
@@ -195,8 +504,9 @@ def internal_error(error):
 
 
 if __name__ == '__main__':
+    # Local development only; production runs under gunicorn gevent workers (see Procfile)
     port = int(os.getenv('PORT', 8000))
     debug = os.getenv('FLASK_ENV') == 'development'
 
-    logger.info(f"Starting Flask server on port {port}")
+    logger.info("Starting Flask server on port %s", port)
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -1,15 +1,121 @@
 """
 Azure Document Intelligence Client
-Handles document analysis using Azure Form Recognizer
+Handles document analysis using the Azure Document Intelligence REST API
 """
+import hashlib
 import os
-from typing import Dict, Any
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
+import re
+import tempfile
+import time
+import ijson
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Union
+from urllib3.util.retry import Retry
+from utils.file_cache import is_expired, make_private_dir, prune_expired, write_private_file
 from utils.logger import setup_logger
 
 logger = setup_logger("AzureClient")
 
+API_VERSION = "2023-07-31"
+
+# Parts of analyzeResult kept by default: the parsers only read table cells
+DEFAULT_INCLUDE = ("tables",)
+
+# File documents up to this size are uploaded from memory (matches the Bitrix
+# download spool, so spooled downloads are never forced to disk by the upload)
+UPLOAD_BUFFER_MAX_SIZE = 8 << 20
+
+# Attempts for an analyze request rejected with 429 (throttled, not started)
+SUBMIT_ATTEMPTS = 4
+
+# Files written to the result cache (see _cache_key)
+_CACHE_PATH_RE = re.compile(r"[\w.+-]+-[0-9a-f]{64}\.json")
+
+# start_analysis returns this prefix plus the cache key for documents already
+# analyzed, so get_analysis_result answers from the cache without a new operation.
+# Tokens of new operations carry the cache key after "#" to store the result.
+CACHED_OPERATION_PREFIX = "cached:"
+
+# Cell fields the parsers consume; everything else in the response is skipped
+_CELL_FIELDS = {"rowIndex", "columnIndex", "content", "rowSpan", "columnSpan"}
+
+
+def _document_size(document: Union[bytes, BinaryIO]) -> int:
+    """Size of a bytes payload or of a seekable file object (position is preserved)"""
+    if isinstance(document, (bytes, bytearray)):
+        return len(document)
+    position = document.tell()
+    document.seek(0, os.SEEK_END)
+    size = document.tell()
+    document.seek(position)
+    return size
+
+
+def _document_digest(document: Union[bytes, BinaryIO]) -> str:
+    """SHA-256 of a bytes payload or of a seekable file object (position is preserved)"""
+    if isinstance(document, (bytes, bytearray)):
+        return hashlib.sha256(document).hexdigest()
+    position = document.tell()
+    document.seek(0)
+    digest = hashlib.file_digest(document, "sha256").hexdigest()
+    document.seek(position)
+    return digest
+
+
+def _parse_operation(stream: BinaryIO, include: Iterable[str] = DEFAULT_INCLUDE) -> Dict[str, Any]:
+    """
+    Stream-parse an analyze operation response
+
+    Only status, error, page count and the included parts ("content" and/or
+    "tables" cells) are materialized; pages, lines, words, spans and polygons
+    are skipped while parsing. Parsing stops early while the operation is
+    still running.
+
+    Returns:
+        {"status": ..., "error": ..., "analyzeResult": {"content", "pageCount", "tables"}}
+    """
+    operation = {"status": None, "error": None}
+    analyze_result = {"content": "", "pageCount": 0, "tables": []}
+    table = None
+    cell = None
+    with_content = "content" in include
+    with_tables = "tables" in include
+
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix == "status":
+            operation["status"] = value
+            if value in ("notStarted", "running"):
+                break
+        elif prefix == "error.message":
+            operation["error"] = value
+        elif prefix == "analyzeResult.content":
+            if with_content:
+                analyze_result["content"] = value
+        elif prefix == "analyzeResult.pages.item" and event == "start_map":
+            analyze_result["pageCount"] += 1
+        elif not with_tables:
+            continue
+        elif prefix == "analyzeResult.tables.item":
+            if event == "start_map":
+                table = {"rowCount": 0, "columnCount": 0, "cells": []}
+                analyze_result["tables"].append(table)
+        elif prefix in ("analyzeResult.tables.item.rowCount", "analyzeResult.tables.item.columnCount"):
+            table[prefix.rsplit(".", 1)[1]] = value
+        elif prefix == "analyzeResult.tables.item.cells.item":
+            if event == "start_map":
+                cell = {"rowSpan": 1, "columnSpan": 1}
+                table["cells"].append(cell)
+        elif prefix.startswith("analyzeResult.tables.item.cells.item."):
+            field = prefix.rsplit(".", 1)[1]
+            if field in _CELL_FIELDS:
+                cell[field] = value
+
+    if operation["status"] == "succeeded":
+        operation["analyzeResult"] = analyze_result
+    return operation
+
 
 class AzureDocumentIntelligence:
     """Client for Azure Document Intelligence API"""
@@ -21,107 +127,267 @@ class AzureDocumentIntelligence:
         if not self.endpoint or not self.key:
             raise ValueError("Azure DI credentials not configured. Check AZURE_DI_ENDPOINT and AZURE_DI_KEY")
 
-        self.client = DocumentAnalysisClient(
-            endpoint=self.endpoint,
-            credential=AzureKeyCredential(self.key)
-        )
+        self.endpoint = self.endpoint.rstrip("/")
+        self.poll_interval = float(os.getenv("AZURE_DI_POLL_INTERVAL", 1.0))
 
-        logger.info(f"AzureDocumentIntelligence initialized with endpoint: {self.endpoint}")
+        self._session = requests.Session()
+        self._session.headers["Ocp-Apim-Subscription-Key"] = self.key
+        # Polls are retried on throttling and transient errors, honouring
+        # Retry-After; the analyze POST handles 429 itself (see _submit)
+        self._session.mount("https://", HTTPAdapter(max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )))
 
-    def analyze_document(self, document_bytes: bytes, model_id: str = "prebuilt-layout") -> Dict[str, Any]:
+        # Analysis results cached on disk by document hash (TTL 0 disables)
+        self.cache_dir = os.getenv("AZURE_DI_CACHE_DIR", os.path.join(tempfile.gettempdir(), "azure_di_cache"))
+        self.cache_ttl = int(os.getenv("AZURE_DI_CACHE_TTL", 7 * 24 * 3600))
+
+        logger.info("AzureDocumentIntelligence initialized with endpoint: %s", self.endpoint)
+
+    def _submit(self, document_bytes: Union[bytes, BinaryIO], model_id: str) -> str:
+        """
+        Submit document for analysis
+
+        Requests throttled with 429 are resent after Retry-After; other
+        errors are not retried, so one document never starts two operations
+
+        Returns:
+            Operation-Location URL to poll
+        """
+        if not isinstance(document_bytes, (bytes, bytearray)):
+            document_bytes.seek(0)
+            # requests sizes file bodies through fileno(), which rolls an in-memory
+            # SpooledTemporaryFile over to disk; send small documents as bytes
+            if _document_size(document_bytes) <= UPLOAD_BUFFER_MAX_SIZE:
+                document_bytes = document_bytes.read()
+
+        url = f"{self.endpoint}/formrecognizer/documentModels/{model_id}:analyze"
+        for attempt in range(1, SUBMIT_ATTEMPTS + 1):
+            if not isinstance(document_bytes, (bytes, bytearray)):
+                document_bytes.seek(0)
+            response = self._session.post(
+                url,
+                params={"api-version": API_VERSION},
+                data=document_bytes,
+                headers={"Content-Type": "application/octet-stream"},
+                timeout=120
+            )
+            if response.status_code != 429 or attempt == SUBMIT_ATTEMPTS:
+                break
+            delay = float(response.headers.get("Retry-After", self.poll_interval * attempt))
+            logger.warning("Analyze request throttled, retrying in %.1fs", delay)
+            time.sleep(delay)
+        response.raise_for_status()
+
+        operation_url = response.headers.get("Operation-Location")
+        if not operation_url:
+            raise Exception("No Operation-Location in analyze response")
+
+        return operation_url
+
+    def _poll(self, operation_url: str, include: Iterable[str] = DEFAULT_INCLUDE) -> Dict[str, Any]:
+        """
+        Fetch analyze operation state once
+
+        Returns:
+            Parsed operation (see _parse_operation); "retryAfter" holds the
+            server-suggested delay in seconds
+        """
+        if not operation_url.startswith(f"{self.endpoint}/"):
+            # Never send the subscription key to a host other than our endpoint
+            raise ValueError("Operation URL does not belong to the configured Azure DI endpoint")
+
+        with self._session.get(operation_url, stream=True, timeout=120) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            operation = _parse_operation(response.raw, include)
+            operation["retryAfter"] = float(response.headers.get("Retry-After", self.poll_interval))
+
+        if operation["status"] == "failed":
+            raise Exception(f"Document analysis failed: {operation['error']}")
+
+        return operation
+
+    def analyze_document(self, document_bytes: Union[bytes, BinaryIO], model_id: str = "prebuilt-layout",
+                         include: Iterable[str] = DEFAULT_INCLUDE) -> Dict[str, Any]:
         """
         Analyze document using Azure Document Intelligence
 
         Args:
-            document_bytes: Document content as bytes
+            document_bytes: Document content as bytes or a readable binary file object
             model_id: Model to use (default: prebuilt-layout)
+            include: Parts of the result to keep: "tables", "content" (default: tables only)
 
         Returns:
-            Analysis result as dictionary
+            REST-style {"analyzeResult": {"content", "pageCount", "tables"}} dictionary;
+            parts not included are left empty
 
         Raises:
             Exception if analysis fails
         """
         try:
-            logger.info(f"Starting document analysis with model: {model_id}")
-            logger.info(f"Document size: {len(document_bytes)} bytes")
+            logger.info("Starting document analysis with model: %s", model_id)
+            logger.info("Document size: %d bytes", _document_size(document_bytes))
+
+            cache_key = self._cache_key(document_bytes, model_id, include)
+            if cache_key:
+                cached = self._load_cached_result(cache_key)
+                if cached is not None:
+                    logger.info("Using cached analysis result %s", cache_key)
+                    return cached
 
             # Start analysis
-            poller = self.client.begin_analyze_document(
-                model_id=model_id,
-                document=document_bytes
-            )
+            operation_url = self._submit(document_bytes, model_id)
 
             logger.info("Waiting for analysis to complete...")
-            result = poller.result()
-
-            # Convert result to dictionary format similar to REST API
-            result_dict = {
-                "status": "succeeded",
-                "analyzeResult": {
-                    "modelId": result.model_id,
-                    "content": result.content,
-                    "pages": [],
-                    "tables": []
-                }
-            }
-
-            # Add pages information
-            for page in result.pages:
-                page_dict = {
-                    "pageNumber": page.page_number,
-                    "width": page.width,
-                    "height": page.height,
-                    "unit": page.unit,
-                    "lines": []
-                }
-
-                # Add lines
-                if hasattr(page, 'lines'):
-                    for line in page.lines:
-                        page_dict["lines"].append({
-                            "content": line.content,
-                            "polygon": line.polygon
-                        })
-
-                result_dict["analyzeResult"]["pages"].append(page_dict)
-
-            # Add tables information
-            if hasattr(result, 'tables'):
-                for table in result.tables:
-                    table_dict = {
-                        "rowCount": table.row_count,
-                        "columnCount": table.column_count,
-                        "cells": []
-                    }
-
-                    for cell in table.cells:
-                        table_dict["cells"].append({
-                            "rowIndex": cell.row_index,
-                            "columnIndex": cell.column_index,
-                            "content": cell.content,
-                            "rowSpan": getattr(cell, 'row_span', 1),
-                            "columnSpan": getattr(cell, 'column_span', 1)
-                        })
-
-                    result_dict["analyzeResult"]["tables"].append(table_dict)
-
-            logger.info(f"Analysis completed successfully")
-            logger.info(f"Pages found: {len(result_dict['analyzeResult']['pages'])}")
-            logger.info(f"Tables found: {len(result_dict['analyzeResult']['tables'])}")
-
-            return result_dict
+            while True:
+                operation = self._poll(operation_url, include)
+                if operation["status"] == "succeeded":
+                    break
+                time.sleep(operation["retryAfter"])
+
+            result = {"status": "succeeded", "analyzeResult": operation["analyzeResult"]}
+
+            logger.info("Analysis completed successfully")
+            logger.info("Pages found: %s", result['analyzeResult']['pageCount'])
+            logger.info("Tables found: %s", len(result['analyzeResult']['tables']))
+
+            if cache_key:
+                self._store_cached_result(cache_key, result)
+
+            return result
+
+        except Exception as e:
+            logger.error("Document analysis failed: %s", e)
+            raise
+
+    def _cache_key(self, document: Union[bytes, BinaryIO], model_id: str, include: Iterable[str]) -> Optional[str]:
+        """Result cache key for a document, None if caching is disabled"""
+        if self.cache_ttl <= 0:
+            return None
+        parts = "+".join(sorted(include))
+        return f"{model_id}-{API_VERSION}-{parts}-{_document_digest(document)}"
+
+    def _cache_path(self, cache_key: str) -> str:
+        return os.path.join(self.cache_dir, f"{cache_key}.json")
+
+    def _load_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Load cached analysis result, None if missing, expired or unreadable"""
+        path = self._cache_path(cache_key)
+        try:
+            if is_expired(path, self.cache_ttl):
+                return None
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Failed to read cached analysis result %s: %s", cache_key, e)
+            return None
+
+    def _store_cached_result(self, cache_key: str, result: Dict[str, Any]) -> None:
+        """Store analysis result in cache; failures are logged and ignored"""
+        try:
+            # Results hold client document text: directory 0700, files 0600
+            make_private_dir(self.cache_dir)
+            write_private_file(self._cache_path(cache_key), orjson.dumps(result))
+            prune_expired(self.cache_dir, self.cache_ttl, _CACHE_PATH_RE)
+        except Exception as e:
+            logger.warning("Failed to cache analysis result %s: %s", cache_key, e)
+
+    def start_analysis(self, document_bytes: Union[bytes, BinaryIO], model_id: str = "prebuilt-layout",
+                       include: Iterable[str] = DEFAULT_INCLUDE) -> str:
+        """
+        Start document analysis without waiting for the result
+
+        Documents with a cached result are not submitted again; the returned
+        token then resolves to the cached result
+
+        Args:
+            document_bytes: Document content as bytes or a readable binary file object
+            model_id: Model to use (default: prebuilt-layout)
+            include: Parts of the result that will be requested (see analyze_document)
+
+        Returns:
+            Operation token to pass to get_analysis_result
+
+        Raises:
+            Exception if the analysis request fails
+        """
+        try:
+            cache_key = self._cache_key(document_bytes, model_id, include)
+            if cache_key and self._load_cached_result(cache_key) is not None:
+                logger.info("Using cached analysis result %s", cache_key)
+                return f"{CACHED_OPERATION_PREFIX}{cache_key}"
+
+            logger.info("Starting background document analysis with model: %s", model_id)
+            operation_url = self._submit(document_bytes, model_id)
+            return f"{operation_url}#{cache_key}" if cache_key else operation_url
+
+        except Exception as e:
+            logger.error("Failed to start document analysis: %s", e)
+            raise
+
+    def get_analysis_result(self, operation_url: str,
+                            include: Iterable[str] = DEFAULT_INCLUDE) -> Optional[Dict[str, Any]]:
+        """
+        Get result of an analysis started with start_analysis
+
+        Any worker process can check the operation, since all state lives in Azure
+        (or, for documents analyzed before, in the shared result cache)
+
+        Args:
+            operation_url: Token returned by start_analysis
+            include: Parts of the result to keep (see analyze_document)
+
+        Returns:
+            Same dictionary as analyze_document, or None if the analysis is still running
+
+        Raises:
+            Exception if the analysis failed
+        """
+        try:
+            cached_operation = operation_url.startswith(CACHED_OPERATION_PREFIX)
+            if cached_operation:
+                cache_key = operation_url[len(CACHED_OPERATION_PREFIX):]
+            else:
+                operation_url, _, cache_key = operation_url.partition("#")
+            if cache_key and not _CACHE_PATH_RE.fullmatch(f"{cache_key}.json"):
+                raise ValueError("Invalid operation token")
+
+            if cached_operation:
+                result = self._load_cached_result(cache_key)
+                if result is None:
+                    raise Exception("Cached analysis result expired, start the analysis again")
+                return result
+
+            operation = self._poll(operation_url, include)
+            if operation["status"] != "succeeded":
+                return None
+
+            result = {"status": "succeeded", "analyzeResult": operation["analyzeResult"]}
+            logger.info("Background analysis completed, tables found: %s", len(result['analyzeResult']['tables']))
+
+            # Keys name the included parts; store only a result of the same shape
+            if cache_key and cache_key.rsplit("-", 2)[1] == "+".join(sorted(include)):
+                self._store_cached_result(cache_key, result)
+
+            return result
 
         except Exception as e:
-            logger.error(f"Document analysis failed: {e}")
+            logger.error("Failed to get analysis result: %s", e)
             raise
 
-    def extract_text(self, document_bytes: bytes) -> str:
+    def extract_text(self, document_bytes: Union[bytes, BinaryIO]) -> str:
         """
         Extract plain text from document
 
         Args:
-            document_bytes: Document content as bytes
+            document_bytes: Document content as bytes or a readable binary file object
 
         Returns:
             Extracted text
@@ -130,11 +396,11 @@ class AzureDocumentIntelligence:
             Exception if extraction fails
         """
         try:
-            result = self.analyze_document(document_bytes)
+            result = self.analyze_document(document_bytes, include=("content",))
             text = result["analyzeResult"]["content"]
-            logger.info(f"Extracted {len(text)} characters of text")
+            logger.info("Extracted %s characters of text", len(text))
             return text
 
         except Exception as e:
-            logger.error(f"Text extraction failed: {e}")
+            logger.error("Text extraction failed: %s", e)
             raise
@@ -2,13 +2,79 @@
 Bitrix24 API Client
 Handles OAuth token refresh, file download, and field updates
 """
+import errno
+import fcntl
+import hashlib
 import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import msgspec
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from tempfile import SpooledTemporaryFile
+from typing import Optional, Dict, Any, BinaryIO, List, Tuple
+from urllib.parse import urlencode
+from urllib3.util.retry import Retry
+from utils.file_cache import is_expired, make_private_dir, prune_expired, write_private_file
 from utils.logger import setup_logger
 
 logger = setup_logger("BitrixClient")
 
+# Downloads larger than this are spooled to disk instead of kept in memory
+DOWNLOAD_SPOOL_MAX_SIZE = 8 << 20
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# Files written to the download cache: SHA-256 blobs and per-portal file-id index entries
+_FILE_CACHE_PATH_RE = re.compile(r"[0-9a-f]{2}/[0-9a-f]{64}|by-id/[\w.-]+/\d+")
+
+
+class TokenResponse(msgspec.Struct):
+    """OAuth token endpoint response"""
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+    expires_in: int = 3600
+    error: Optional[str] = None
+    error_description: Optional[str] = None
+
+
+class BitrixResponse(msgspec.Struct):
+    """Bitrix24 REST method response"""
+    result: Any = None
+    error: Optional[str] = None
+    error_description: Optional[str] = None
+
+
+class StoredToken(msgspec.Struct):
+    """Token state shared between worker processes through the token file"""
+    access_token: str
+    refresh_token: str
+    expires_at: float
+    # BITRIX_REFRESH_TOKEN the stored tokens descend from
+    env_refresh_token: Optional[str] = None
+
+
+_token_decoder = msgspec.json.Decoder(TokenResponse)
+_stored_token_decoder = msgspec.json.Decoder(StoredToken)
+_response_decoder = msgspec.json.Decoder(BitrixResponse)
+
+
+def _flatten_params(params: Dict[str, Any], prefix: str = "") -> List[Tuple[str, Any]]:
+    """Flatten nested params into PHP-style keys (fields[TITLE]=...) for batch commands"""
+    items = []
+    for key, value in params.items():
+        full_key = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, dict):
+            items.extend(_flatten_params(value, full_key))
+        elif isinstance(value, (list, tuple)):
+            for idx, item in enumerate(value):
+                items.append((f"{full_key}[{idx}]", item))
+        else:
+            items.append((full_key, value))
+    return items
+
 
 class BitrixClient:
     """Client for interacting with Bitrix24 API"""
@@ -19,20 +85,150 @@ class BitrixClient:
         self.client_id = os.getenv("BITRIX_CLIENT_ID")
         self.client_secret = os.getenv("BITRIX_CLIENT_SECRET")
         self.refresh_token = os.getenv("BITRIX_REFRESH_TOKEN")
+        self._env_refresh_token = self.refresh_token
         self.access_token: Optional[str] = None
+        self._token_expires_at: float = 0.0
+        self._token_lock = threading.Lock()
+
+        # Tokens shared by all workers and kept across restarts (empty disables).
+        # Bitrix rotates refresh tokens, so workers must not refresh independently.
+        # The default file is per portal and app, so several never share tokens.
+        token_name = re.sub(r"[^\w.-]", "_", f"bitrix_token_{self.domain}_{self.client_id}")
+        self.token_file = os.getenv("BITRIX_TOKEN_FILE", os.path.join(tempfile.gettempdir(), f"{token_name}.json"))
+        self._load_token_file()
+
+        # Persistent session: keep-alive reuses TCP+TLS connections across calls
+        self._session = requests.Session()
+        # Retries only for portal calls: the OAuth refresh rotates the refresh
+        # token, so resending it after the server already used it would fail
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self._session.mount(f"https://{self.domain}/", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        ))
+
+        # Downloaded files: content-addressed by SHA-256, indexed by Bitrix file id
+        # per portal, since ids are only unique within one (empty dir or TTL 0 disables)
+        self.file_cache_dir = os.getenv("BITRIX_FILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bitrix_files"))
+        self.file_cache_ttl = int(os.getenv("BITRIX_FILE_CACHE_TTL", 24 * 3600))
+        self._file_index_dir = os.path.join(self.file_cache_dir, "by-id", re.sub(r"[^\w.-]", "_", self.domain))
+
+        logger.info("BitrixClient initialized for domain: %s", self.domain)
+
+    def _token_is_fresh(self) -> bool:
+        return bool(self.access_token) and time.time() < self._token_expires_at
+
+    def _load_token_file(self) -> bool:
+        """
+        Load tokens saved by any worker; returns True if loaded
+
+        Stored tokens descending from a different BITRIX_REFRESH_TOKEN are
+        ignored, so rotating the token in the environment takes effect.
+        """
+        if not self.token_file:
+            return False
+        try:
+            with open(self.token_file, "rb") as f:
+                stored = _stored_token_decoder.decode(f.read())
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Failed to read token file: %s", e)
+            return False
+
+        if stored.env_refresh_token != self._env_refresh_token:
+            logger.info("BITRIX_REFRESH_TOKEN changed since the token file was written, ignoring it")
+            return False
+
+        self.access_token = stored.access_token
+        self.refresh_token = stored.refresh_token
+        self._token_expires_at = stored.expires_at
+        return True
+
+    def _save_token_file(self) -> None:
+        """Save current tokens for other workers; failures are logged and ignored"""
+        if not self.token_file:
+            return
+        try:
+            stored = StoredToken(self.access_token, self.refresh_token, self._token_expires_at,
+                                 self._env_refresh_token)
+            # Tokens are credentials: keep the file private to this user
+            write_private_file(self.token_file, msgspec.json.encode(stored))
+        except Exception as e:
+            logger.warning("Failed to save token file: %s", e)
+
+    @contextmanager
+    def _token_file_lock(self, timeout: float = 60.0):
+        """
+        Inter-process lock around token refresh
 
-        logger.info(f"BitrixClient initialized for domain: {self.domain}")
+        Polls a non-blocking flock so a waiting gevent worker keeps serving
+        other greenlets. On timeout the refresh proceeds without the lock.
+        """
+        if not self.token_file:
+            yield
+            return
 
-    def _refresh_access_token(self) -> str:
+        fd = os.open(f"{self.token_file}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            deadline = time.monotonic() + timeout
+            locked = False
+            while not locked:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except OSError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EACCES) or time.monotonic() > deadline:
+                        logger.warning("Token file lock not acquired: %s", e)
+                        break
+                    time.sleep(0.05)
+            yield
+        finally:
+            os.close(fd)
+
+    def _refresh_access_token(self, failed_token: Optional[str]) -> str:
         """
         Refresh OAuth access token using refresh token
 
+        Args:
+            failed_token: Access token that was rejected; no refresh happens if
+                another thread or worker has already replaced it
+
         Returns:
             New access token
 
         Raises:
             Exception if token refresh fails
         """
+        with self._token_lock:
+            return self._refresh_access_token_locked(failed_token)
+
+    def _refresh_access_token_locked(self, failed_token: Optional[str]) -> str:
+        """Refresh access token; caller must hold self._token_lock"""
+        # Another thread of this worker may have refreshed already
+        if self.access_token != failed_token and self._token_is_fresh():
+            return self.access_token
+
+        with self._token_file_lock():
+            # Another worker process may have refreshed already
+            if self._load_token_file() and self.access_token != failed_token and self._token_is_fresh():
+                logger.info("Using access token refreshed by another worker")
+                return self.access_token
+
+            try:
+                return self._request_new_token()
+            except Exception:
+                # The stored refresh token may be revoked; the one from the
+                # environment is the last resort
+                if not self._env_refresh_token or self.refresh_token == self._env_refresh_token:
+                    raise
+                logger.warning("Stored refresh token rejected, retrying with BITRIX_REFRESH_TOKEN")
+                self.refresh_token = self._env_refresh_token
+                return self._request_new_token()
+
+    def _request_new_token(self) -> str:
+        """Call the OAuth endpoint and store the new tokens"""
         try:
             logger.info("Refreshing Bitrix24 access token...")
 
@@ -43,25 +239,29 @@ class BitrixClient:
                 "refresh_token": self.refresh_token
             }
 
-            response = requests.get(self.oauth_url, params=params, timeout=30)
+            response = self._session.get(self.oauth_url, params=params, timeout=30)
             response.raise_for_status()
 
-            data = response.json()
+            data = _token_decoder.decode(response.content)
 
-            if "access_token" not in data:
+            if not data.access_token:
                 raise Exception(f"No access_token in response: {data}")
 
-            self.access_token = data["access_token"]
+            self.access_token = data.access_token
+            # Refresh a minute before Bitrix actually expires the token
+            self._token_expires_at = time.time() + data.expires_in - 60
 
             # Update refresh token if provided
-            if "refresh_token" in data:
-                self.refresh_token = data["refresh_token"]
+            if data.refresh_token:
+                self.refresh_token = data.refresh_token
+
+            self._save_token_file()
 
             logger.info("Access token refreshed successfully")
             return self.access_token
 
         except Exception as e:
-            logger.error(f"Failed to refresh access token: {e}")
+            logger.error("Failed to refresh access token: %s", e)
             raise
 
     def get_access_token(self) -> str:
@@ -71,99 +271,229 @@ class BitrixClient:
         Returns:
             Valid access token
         """
-        if not self.access_token:
-            return self._refresh_access_token()
-        return self.access_token
+        if self._token_is_fresh():
+            return self.access_token
 
-    def download_file_from_field(self, deal_id: int, field_code: str) -> bytes:
+        with self._token_lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._token_is_fresh():
+                return self.access_token
+            return self._refresh_access_token_locked(self.access_token)
+
+    def warm_up(self) -> None:
         """
-        Download file from Bitrix24 deal field
+        Open keep-alive connections and fetch a token ahead of the first webhook
 
-        The field contains file info with downloadUrl
-        Uses your schema: get downloadUrl from field, then download with auth token
+        Failures are logged and ignored; the first real call simply pays the cost
+        """
+        try:
+            self.get_access_token()
+            self._session.head(f"https://{self.domain}/", timeout=5)
+            logger.info("Bitrix24 connections warmed up")
+        except Exception as e:
+            logger.warning("Bitrix24 warm-up failed: %s", e)
+
+    def _authorized_request(self, method: str, url: str, payload: Dict[str, Any]) -> requests.Response:
+        """
+        Send REST request with access token, refreshing it once on 401
+
+        GET requests send payload as query params, other methods as JSON body.
+        payload["auth"] holds the token that was actually used afterwards.
+
+        Returns:
+            Successful response
+
+        Raises:
+            requests.HTTPError if the final response is not successful
+        """
+        payload_key = "params" if method == "GET" else "json"
+
+        payload["auth"] = self.get_access_token()
+        response = self._session.request(method, url, timeout=30, **{payload_key: payload})
+
+        # If unauthorized, refresh token and retry
+        if response.status_code == 401:
+            logger.warning("Access token expired, refreshing...")
+            payload["auth"] = self._refresh_access_token(payload["auth"])
+            response = self._session.request(method, url, timeout=30, **{payload_key: payload})
+
+        response.raise_for_status()
+        return response
+
+    def get_field_file(self, deal_id: int, field_code: str) -> Dict[str, Any]:
+        """
+        Get info of the file stored in a Bitrix24 deal field
 
         Args:
             deal_id: Deal ID
             field_code: Field code containing file (e.g., UF_CRM_1765540040027)
 
         Returns:
-            File content as bytes
+            File info with "id" and "downloadUrl" (first file of multi-file fields)
 
         Raises:
-            Exception if download fails
+            Exception if the deal, field or download URL is missing
         """
-        try:
-            logger.info(f"Downloading file from deal {deal_id}, field {field_code}")
+        # Get file field value from deal (token cached until near expiry)
+        logger.info("Getting file info from deal %s, field %s", deal_id, field_code)
+        # crm.deal.get always returns the whole deal; crm.deal.list honours
+        # select, so only the file field is transferred and parsed
+        deal_url = f"https://{self.domain}/rest/crm.deal.list"
+        deal_params = {
+            "filter[ID]": deal_id,
+            "select[]": [field_code]
+        }
 
-            # Step 1: Get fresh access token
-            token_response = requests.get(self.oauth_url, params={
-                "grant_type": "refresh_token",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "refresh_token": self.refresh_token
-            }, timeout=30)
+        deal_response = self._authorized_request("GET", deal_url, deal_params)
+        deal_data = _response_decoder.decode(deal_response.content)
 
-            token_response.raise_for_status()
-            token_data = token_response.json()
+        if deal_data.result is None:
+            raise Exception(f"No result in deal response: {deal_data}")
 
-            if "access_token" not in token_data:
-                raise Exception(f"No access_token in response: {token_data}")
+        if not deal_data.result:
+            raise Exception(f"Deal {deal_id} not found")
 
-            access_token = token_data["access_token"]
-            logger.info("Access token obtained successfully")
+        file_field = deal_data.result[0].get(field_code)
 
-            # Step 2: Get file field value from deal
-            logger.info(f"Getting file info from field {field_code}")
-            deal_url = f"https://{self.domain}/rest/crm.deal.get"
-            deal_params = {
-                "auth": access_token,
-                "id": deal_id
-            }
+        if not file_field:
+            raise Exception(f"Field {field_code} is empty or not found")
 
-            deal_response = requests.get(deal_url, params=deal_params, timeout=30)
-            deal_response.raise_for_status()
-            deal_data = deal_response.json()
+        logger.info("File field value: %s", file_field)
 
-            if "result" not in deal_data:
-                raise Exception(f"No result in deal response: {deal_data}")
+        # File field can be a dict or array of dicts
+        file_info = {}
 
-            file_field = deal_data["result"].get(field_code)
+        if isinstance(file_field, dict):
+            file_info = file_field
+        elif isinstance(file_field, list) and len(file_field) > 0:
+            file_info = file_field[0]
 
-            if not file_field:
-                raise Exception(f"Field {field_code} is empty or not found")
+        if not file_info.get("downloadUrl"):
+            raise Exception(f"No downloadUrl found in field value: {file_field}")
 
-            logger.info(f"File field value: {file_field}")
+        return file_info
 
-            # Step 3: Extract downloadUrl
-            # File field can be a dict or array of dicts
-            download_url = None
+    def download_file(self, file_info: Dict[str, Any]) -> BinaryIO:
+        """
+        Download a file described by get_field_file
 
-            if isinstance(file_field, dict):
-                download_url = file_field.get("downloadUrl")
-            elif isinstance(file_field, list) and len(file_field) > 0:
-                download_url = file_field[0].get("downloadUrl")
+        Args:
+            file_info: File info with "id" and "downloadUrl"
 
-            if not download_url:
-                raise Exception(f"No downloadUrl found in field value: {file_field}")
+        Returns:
+            Spooled or cached file object positioned at start (caller should close it)
 
-            logger.info(f"Download URL extracted: {download_url}")
+        Raises:
+            Exception if download fails
+        """
+        download_url = file_info["downloadUrl"]
+        logger.info("Download URL extracted: %s", download_url)
 
-            # Step 4: Download file using your schema
-            file_url = f"https://{self.domain}{download_url}&auth={access_token}"
-            logger.info(f"Downloading from: {file_url}")
+        # Same Bitrix file as a previous download: reuse the local copy
+        file_id = file_info.get("id")
+        cached = self._open_cached_file(file_id)
+        if cached is not None:
+            logger.info("Using cached copy of file %s", file_id)
+            return cached
 
-            file_response = requests.get(file_url, stream=True, timeout=60)
-            file_response.raise_for_status()
+        # Download file using your schema
+        file_url = f"https://{self.domain}{download_url}&auth={self.get_access_token()}"
 
-            content = file_response.content
-            logger.info(f"File downloaded successfully, size: {len(content)} bytes")
+        content = SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_SIZE)
+        try:
+            with self._session.get(file_url, stream=True, timeout=60) as file_response:
+                file_response.raise_for_status()
+                for chunk in file_response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    content.write(chunk)
+        except Exception:
+            content.close()
+            raise
+
+        size = content.tell()
+        content.seek(0)
+        logger.info("File downloaded successfully, size: %d bytes", size)
+
+        self._store_cached_file(file_id, content)
+
+        return content
+
+    def download_file_from_field(self, deal_id: int, field_code: str) -> BinaryIO:
+        """
+        Download file from Bitrix24 deal field
+
+        The field contains file info with downloadUrl
+        Uses your schema: get downloadUrl from field, then download with auth token
+
+        Args:
+            deal_id: Deal ID
+            field_code: Field code containing file (e.g., UF_CRM_1765540040027)
+
+        Returns:
+            Spooled or cached file object positioned at start (caller should close it)
 
-            return content
+        Raises:
+            Exception if download fails
+        """
+        try:
+            logger.info("Downloading file from deal %s, field %s", deal_id, field_code)
+            return self.download_file(self.get_field_file(deal_id, field_code))
 
         except Exception as e:
-            logger.error(f"Failed to download file from deal {deal_id}: {e}")
+            logger.error("Failed to download file from deal %s: %s", deal_id, e)
             raise
 
+    def _file_index_path(self, file_id: Any) -> Optional[str]:
+        if not self.file_cache_dir or self.file_cache_ttl <= 0 or not file_id:
+            return None
+        return os.path.join(self._file_index_dir, str(int(file_id)))
+
+    def _open_cached_file(self, file_id: Any) -> Optional[BinaryIO]:
+        """Open cached download for a Bitrix file id, None if not cached or expired"""
+        try:
+            index_path = self._file_index_path(file_id)
+            if not index_path or is_expired(index_path, self.file_cache_ttl):
+                return None
+            with open(index_path) as f:
+                digest = f.read().strip()
+            return open(os.path.join(self.file_cache_dir, digest[:2], digest), "rb")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Failed to read cached file %s: %s", file_id, e)
+            return None
+
+    def _store_cached_file(self, file_id: Any, content: BinaryIO) -> None:
+        """Store download in the content-addressed cache; failures are logged and ignored"""
+        try:
+            index_path = self._file_index_path(file_id)
+            if not index_path:
+                return
+
+            digest = hashlib.file_digest(content, "sha256").hexdigest()
+            content.seek(0)
+
+            # Client documents: directories 0700, files 0600
+            make_private_dir(self.file_cache_dir)
+            blob_dir = os.path.join(self.file_cache_dir, digest[:2])
+            blob_path = os.path.join(blob_dir, digest)
+            if os.path.exists(blob_path):
+                # Same content under another id: restart its TTL with the new index entry
+                os.utime(blob_path)
+            else:
+                make_private_dir(blob_dir)
+                write_private_file(blob_path, content)
+                content.seek(0)
+
+            make_private_dir(os.path.dirname(self._file_index_dir))
+            make_private_dir(self._file_index_dir)
+            write_private_file(index_path, digest.encode())
+
+            prune_expired(self.file_cache_dir, self.file_cache_ttl, _FILE_CACHE_PATH_RE)
+
+        except Exception as e:
+            content.seek(0)
+            logger.warning("Failed to cache file %s: %s", file_id, e)
+
     def update_deal_field(self, deal_id: int, field_code: str, value: str) -> bool:
         """
         Update a field in Bitrix24 deal
@@ -180,39 +510,27 @@ class BitrixClient:
             Exception if update fails
         """
         try:
-            logger.info(f"Updating deal {deal_id} field {field_code}")
-
-            token = self.get_access_token()
+            logger.info("Updating deal %s field %s", deal_id, field_code)
 
             method_url = f"https://{self.domain}/rest/crm.deal.update"
             params = {
-                "auth": token,
                 "id": deal_id,
                 "fields": {
                     field_code: value
                 }
             }
 
-            response = requests.post(method_url, json=params, timeout=30)
-
-            # If unauthorized, refresh token and retry
-            if response.status_code == 401:
-                logger.warning("Access token expired, refreshing...")
-                token = self._refresh_access_token()
-                params["auth"] = token
-                response = requests.post(method_url, json=params, timeout=30)
-
-            response.raise_for_status()
-            data = response.json()
+            response = self._authorized_request("POST", method_url, params)
+            data = _response_decoder.decode(response.content)
 
-            if not data.get("result"):
+            if not data.result:
                 raise Exception(f"Update failed: {data}")
 
-            logger.info(f"Deal field updated successfully")
+            logger.info("Deal field updated successfully")
             return True
 
         except Exception as e:
-            logger.error(f"Failed to update deal {deal_id}: {e}")
+            logger.error("Failed to update deal %s: %s", deal_id, e)
             raise
 
     def add_timeline_comment(self, deal_id: int, comment: str) -> bool:
@@ -230,13 +548,10 @@ class BitrixClient:
             Exception if adding comment fails
         """
         try:
-            logger.info(f"Adding timeline comment to deal {deal_id}")
-
-            token = self.get_access_token()
+            logger.info("Adding timeline comment to deal %s", deal_id)
 
             method_url = f"https://{self.domain}/rest/crm.timeline.comment.add"
             params = {
-                "auth": token,
                 "fields": {
                     "ENTITY_ID": deal_id,
                     "ENTITY_TYPE": "deal",
@@ -244,26 +559,17 @@ class BitrixClient:
                 }
             }
 
-            response = requests.post(method_url, json=params, timeout=30)
-
-            # If unauthorized, refresh token and retry
-            if response.status_code == 401:
-                logger.warning("Access token expired, refreshing...")
-                token = self._refresh_access_token()
-                params["auth"] = token
-                response = requests.post(method_url, json=params, timeout=30)
-
-            response.raise_for_status()
-            data = response.json()
+            response = self._authorized_request("POST", method_url, params)
+            data = _response_decoder.decode(response.content)
 
-            if not data.get("result"):
+            if not data.result:
                 raise Exception(f"Adding comment failed: {data}")
 
-            logger.info(f"Timeline comment added successfully")
+            logger.info("Timeline comment added successfully")
             return True
 
         except Exception as e:
-            logger.error(f"Failed to add timeline comment to deal {deal_id}: {e}")
+            logger.error("Failed to add timeline comment to deal %s: %s", deal_id, e)
             raise
 
     def get_deal_field(self, deal_id: int, field_code: str) -> Any:
@@ -281,36 +587,76 @@ class BitrixClient:
             Exception if retrieval fails
         """
         try:
-            logger.info(f"Getting deal {deal_id} field {field_code}")
+            logger.info("Getting deal %s field %s", deal_id, field_code)
 
-            token = self.get_access_token()
-
-            method_url = f"https://{self.domain}/rest/crm.deal.get"
+            method_url = f"https://{self.domain}/rest/crm.deal.list"
             params = {
-                "auth": token,
-                "id": deal_id
+                "filter[ID]": deal_id,
+                "select[]": [field_code]
             }
 
-            response = requests.get(method_url, params=params, timeout=30)
-
-            # If unauthorized, refresh token and retry
-            if response.status_code == 401:
-                logger.warning("Access token expired, refreshing...")
-                token = self._refresh_access_token()
-                params["auth"] = token
-                response = requests.get(method_url, params=params, timeout=30)
-
-            response.raise_for_status()
-            data = response.json()
+            response = self._authorized_request("GET", method_url, params)
+            data = _response_decoder.decode(response.content)
 
-            if "result" not in data:
+            if data.result is None:
                 raise Exception(f"No result in response: {data}")
 
-            value = data["result"].get(field_code)
-            logger.info(f"Field value retrieved: {value}")
+            if not data.result:
+                raise Exception(f"Deal {deal_id} not found")
+
+            value = data.result[0].get(field_code)
+            logger.info("Field value retrieved: %s", value)
 
             return value
 
         except Exception as e:
-            logger.error(f"Failed to get deal {deal_id} field {field_code}: {e}")
+            logger.error("Failed to get deal %s field %s: %s", deal_id, field_code, e)
+            raise
+
+    def batch(self, commands: Dict[str, Tuple[str, Dict[str, Any]]], halt: bool = True) -> Dict[str, Any]:
+        """
+        Execute several REST methods in one request via Bitrix24 batch
+
+        Args:
+            commands: {name: (method, params)}, up to 50 commands
+            halt: Stop on the first failed command
+
+        Returns:
+            Results keyed by command name
+
+        Raises:
+            Exception if the request or any command fails
+        """
+        try:
+            logger.info("Executing Bitrix24 batch: %s", ', '.join(commands.keys()))
+
+            method_url = f"https://{self.domain}/rest/batch"
+            params = {
+                "halt": 1 if halt else 0,
+                "cmd": {
+                    name: f"{method}?{urlencode(_flatten_params(method_params))}"
+                    for name, (method, method_params) in commands.items()
+                }
+            }
+
+            response = self._authorized_request("POST", method_url, params)
+            data = _response_decoder.decode(response.content)
+
+            if data.result is None:
+                raise Exception(f"No result in batch response: {data}")
+
+            errors = data.result.get("result_error")
+            if errors:
+                raise Exception(f"Batch commands failed: {errors}")
+
+            results = data.result.get("result") or {}
+            missing = [name for name in commands if not results.get(name)]
+            if missing:
+                raise Exception(f"Batch commands returned no result: {missing}")
+
+            logger.info("Batch executed successfully")
+            return results
+
+        except Exception as e:
+            logger.error("Failed to execute batch: %s", e)
             raise
@@ -3,7 +3,7 @@ Base Parser class
 All document parsers should inherit from this class
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List
 from utils.logger import setup_logger
 
 logger = setup_logger("BaseParser")
@@ -70,3 +70,15 @@ class BaseParser(ABC):
             raise ValueError("Missing 'content' in analyzeResult")
 
         return True
+
+    def get_tables(self, azure_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Get tables from Azure result
+
+        Args:
+            azure_result: Result from Azure Document Intelligence
+
+        Returns:
+            List of tables (empty if none)
+        """
+        return azure_result["analyzeResult"].get("tables", []) or []
@@ -3,66 +3,69 @@ Income Statement Parser
 Parses Ukrainian income statement (Справка про доходи)
 """
 import re
-import json
+import sys
+import logging
+import orjson
 from typing import Dict, Any, List, Tuple, Optional
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from itertools import groupby
 from .base_parser import BaseParser
 from utils.logger import setup_logger
 
 logger = setup_logger("IncomeStatementParser")
 
+# Row patterns, compiled once at import
+_YEAR_RE = re.compile(r'\b(20\d{2})\b')
+_AMOUNT_RE = re.compile(r'(\d+\.?\d*)')
+_CODE_NAME_RE = re.compile(r'\b(\d{3})\b(?:\s*-?\s*(.+))?')
+
+# Amount normalization: drop (non-breaking) spaces, decimal comma -> point
+_AMOUNT_TT = str.maketrans({" ": None, "\xa0": None, ",": "."})
+
+# One parsed income row
+Record = namedtuple("Record", "year code code_name amount")
+
 
 class IncomeStatementParser(BaseParser):
     """Parser for Ukrainian income statement documents"""
 
+    # The index row sits under the multi-level header, within the first rows of a table
+    MAX_HEADER_ROWS = 10
+
     def __init__(self):
         super().__init__()
         self.logger.info("IncomeStatementParser initialized")
 
     # ========== Helper Methods ==========
 
-    def _get_cell_value(self, cell: Any, key: str, default: Any = None) -> Any:
-        """Get value from cell (supports both dict and object)"""
-        if hasattr(cell, key):
-            return getattr(cell, key)
-        if isinstance(cell, dict):
-            return cell.get(key, default)
-        return default
-
-    def _table_to_grid(self, table: Any) -> Tuple[Dict, Dict]:
+    def _table_to_grid(self, table: Dict[str, Any]) -> Dict[int, Dict[int, str]]:
         """
         Convert table to grid structure
         Returns:
-            grid: dict[(row_idx, col_idx)] = text
             rows: dict[row_idx] = dict[col_idx]=text
         """
-        # Get cells from table
-        if hasattr(table, "cells"):
-            cells = table.cells
-        else:
-            cells = table.get("cells", [])
-
-        grid = {}
         rows = defaultdict(dict)
 
-        for cell in cells:
-            row_idx = self._get_cell_value(cell, "rowIndex", 0)
-            col_idx = self._get_cell_value(cell, "columnIndex", 0)
-            content = self._get_cell_value(cell, "content", "") or ""
-            content = str(content).strip()
+        # Empty cells are not stored; readers use row.get(col, "")
+        # and rows without any content are never data
+        for cell in table.get("cells", []):
+            content = (cell.get("content") or "").strip()
+            if content:
+                rows[cell.get("rowIndex", 0)][cell.get("columnIndex", 0)] = content
 
-            grid[(row_idx, col_idx)] = content
-            rows[row_idx][col_idx] = content
+        return rows
 
-        return grid, rows
-
-    def _find_index_row_and_cols(self, rows: Dict) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    def _find_index_row_and_cols(self, rows: Dict, row_ids: Optional[List[int]] = None) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
         """
         Find row where col[0]='1' and locate columns '4', '7', '13'
+        Only the first MAX_HEADER_ROWS rows are checked
+        row_ids: rows.keys() already sorted, if the caller has them
         Returns: (index_row, col_year, col_amount, col_code) or (None, None, None, None)
         """
-        for row_idx in sorted(rows.keys()):
-            if rows[row_idx].get(0, "").strip() != "1":
+        for row_idx in (row_ids if row_ids is not None else sorted(rows))[:self.MAX_HEADER_ROWS]:
+            row = rows[row_idx]
+            # Cell contents are already stripped strings (see _table_to_grid)
+            if row.get(0) != "1":
                 continue
 
             # Found the index row, now find columns
@@ -70,34 +73,39 @@ class IncomeStatementParser(BaseParser):
             col_amount = None
             col_code = None
 
-            for col_idx, value in rows[row_idx].items():
-                value_str = str(value).strip()
-                if value_str == "4":
+            # First occurrence of each marker wins; a repeated marker never
+            # overwrites a column that is already found
+            for col_idx, value in row.items():
+                if value == "4" and col_year is None:
                     col_year = col_idx
-                elif value_str == "7":
+                elif value == "7" and col_amount is None:
                     col_amount = col_idx
-                elif value_str == "13":
+                elif value == "13" and col_code is None:
                     col_code = col_idx
+                else:
+                    continue
 
-            if col_year is not None and col_amount is not None and col_code is not None:
-                return row_idx, col_year, col_amount, col_code
+                if col_year is not None and col_amount is not None and col_code is not None:
+                    return row_idx, col_year, col_amount, col_code
 
         return None, None, None, None
 
-    def _extract_rows_for_processing(self, table_idx: int, table: Any, fallback_cols: Optional[Tuple] = None) -> Tuple[List[Dict], Optional[Tuple]]:
+    def _extract_rows_for_processing(self, table_idx: int, table: Dict[str, Any], fallback_cols: Optional[Tuple] = None) -> Tuple[List[Dict], Optional[Tuple]]:
         """
         Extract rows from table, cutting multi-level header if found
         Returns: (list of row dicts, column indices tuple)
         """
-        _, rows = self._table_to_grid(table)
-        index_row, col_year, col_amount, col_code = self._find_index_row_and_cols(rows)
+        rows = self._table_to_grid(table)
+        # Only cells present in the table are in the grid; sort their rows once
+        row_ids = sorted(rows)
+        index_row, col_year, col_amount, col_code = self._find_index_row_and_cols(rows, row_ids)
 
         # If index row not found in this table, use fallback columns from table 1
         if index_row is None:
             if not fallback_cols:
                 # No column info - return raw data
                 out = []
-                for row_idx in sorted(rows.keys()):
+                for row_idx in row_ids:
                     out.append({
                         "table_idx": table_idx,
                         "row_idx": row_idx,
@@ -106,10 +114,10 @@ class IncomeStatementParser(BaseParser):
                 return out, None
 
             col_year, col_amount, col_code = fallback_cols
-            clean_row_ids = sorted(rows.keys())
+            clean_row_ids = row_ids
         else:
             # Take only rows AFTER index row
-            clean_row_ids = [r for r in sorted(rows.keys()) if r > index_row]
+            clean_row_ids = row_ids[row_ids.index(index_row) + 1:]
 
         # Extract data from rows
         out = []
@@ -126,6 +134,37 @@ class IncomeStatementParser(BaseParser):
 
         return out, (col_year, col_amount, col_code)
 
+    def _find_start_table(self, tables: List[Dict[str, Any]]) -> Tuple[int, List[Dict], Tuple]:
+        """
+        Find the table holding the index row: table 1 first, then the others in order
+        Returns: (table index, rows after the index row, column indices tuple)
+        """
+        order = [1] + [i for i in range(len(tables)) if i != 1]
+
+        for attempt, table_idx in enumerate(order):
+            if attempt == 1:
+                self.logger.error("Cannot find index row in Table 1")
+                self.logger.error("Trying to find index row in ALL tables...")
+            if attempt:
+                self.logger.info("Checking table %d for index row...", table_idx)
+
+            # Dump table structure only when debugging (builds an extra grid)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                rows_debug = self._table_to_grid(tables[table_idx])
+                self.logger.debug("Table %d structure: %d rows", table_idx, len(rows_debug))
+                for row_idx in sorted(rows_debug)[:5]:
+                    row = rows_debug[row_idx]
+                    self.logger.debug("  Row %d: col[0]=%s col[1]=%s col[2]=%s col[3]=%s",
+                                      row_idx, row.get(0, ''), row.get(1, ''), row.get(2, ''), row.get(3, ''))
+
+            rows, cols = self._extract_rows_for_processing(table_idx, tables[table_idx], fallback_cols=None)
+            if cols is not None:
+                if attempt:
+                    self.logger.info("Found index row in table %d!", table_idx)
+                return table_idx, rows, cols
+
+        raise RuntimeError("Cannot find index row in ANY table (col[0]='1' + '4','7','13')")
+
     def parse(self, azure_result: Dict[str, Any]) -> Dict[str, Any]:
         """
         Parse income statement from Azure DI result
@@ -133,7 +172,8 @@ class IncomeStatementParser(BaseParser):
         New logic:
         1. Table 0 - skip (document header)
         2. Table 1 - find row where col[0]='1', cut everything above
-        3. Tables 2+ - use column indices from table 1
+           (if it has none, the first other table that does is used)
+        3. Following tables - use column indices from that table
         4. Filter out "Всього" rows (save for verification)
         5. Extract and group data
 
@@ -146,8 +186,8 @@ class IncomeStatementParser(BaseParser):
         try:
             self.validate_result(azure_result)
 
-            tables = azure_result["analyzeResult"].get("tables", [])
-            self.logger.info(f"Parsing document with {len(tables)} tables")
+            tables = self.get_tables(azure_result)
+            self.logger.info("Parsing document with %d tables", len(tables))
 
             if len(tables) <= 1:
                 self.logger.error("Not enough tables (need at least 2)")
@@ -157,68 +197,27 @@ class IncomeStatementParser(BaseParser):
                     "data": {}
                 }
 
-            all_rows = []
-            cols = None
-
             # Table 0 - skip (document header)
             self.logger.info("Table 0: Skipped (document header)")
 
-            # Table 1 - find index row and cut header
-            # First, debug table 1 structure
-            _, rows_1_debug = self._table_to_grid(tables[1])
-            self.logger.info(f"Table 1 structure: {len(rows_1_debug)} rows")
-            for i in range(min(5, len(rows_1_debug))):
-                row = rows_1_debug.get(i, {})
-                self.logger.info(f"  Row {i}: col[0]={row.get(0, '')} col[1]={row.get(1, '')} col[2]={row.get(2, '')} col[3]={row.get(3, '')}")
+            # Table with the index row (normally table 1) - cut header
+            start_idx, start_rows, cols = self._find_start_table(tables)
+            self.logger.info("Table %d: Processed, header cut. Columns: year=%s, amount=%s, code=%s", start_idx, *cols)
 
-            rows_1, cols = self._extract_rows_for_processing(1, tables[1], fallback_cols=None)
+            # Parse data from rows table by table, so raw rows of earlier
+            # tables are released before the next one is cut
+            records, totals = self._parse_rows_data(start_rows)
+            del start_rows
 
-            if cols is None:
-                self.logger.error("Cannot find index row in Table 1")
-                self.logger.error("Trying to find index row in ALL tables...")
+            # Following tables - use columns from the start table
+            for table_idx in range(start_idx + 1, len(tables)):
+                rows_i, _ = self._extract_rows_for_processing(table_idx, tables[table_idx], fallback_cols=cols)
+                self.logger.info("Table %d: Added %d rows", table_idx, len(rows_i))
+                records_i, totals_i = self._parse_rows_data(rows_i)
+                records.extend(records_i)
+                totals.extend(totals_i)
 
-                # Try to find in any table
-                for table_idx in range(len(tables)):
-                    self.logger.info(f"Checking table {table_idx} for index row...")
-                    _, rows_debug = self._table_to_grid(tables[table_idx])
-                    self.logger.info(f"  Table {table_idx}: {len(rows_debug)} rows")
-
-                    for row_idx in list(rows_debug.keys())[:5]:
-                        row = rows_debug[row_idx]
-                        self.logger.info(f"    Row {row_idx}: col[0]={row.get(0, '')[:20]}")
-
-                    rows_temp, cols_temp = self._extract_rows_for_processing(table_idx, tables[table_idx], fallback_cols=None)
-                    if cols_temp is not None:
-                        self.logger.info(f"Found index row in table {table_idx}!")
-                        # Use this table as starting point
-                        all_rows.extend(rows_temp)
-                        cols = cols_temp
-
-                        # Add all subsequent tables
-                        for next_idx in range(table_idx + 1, len(tables)):
-                            rows_next, _ = self._extract_rows_for_processing(next_idx, tables[next_idx], fallback_cols=cols)
-                            all_rows.extend(rows_next)
-                            self.logger.info(f"Table {next_idx}: Added {len(rows_next)} rows")
-
-                        break
-
-                if cols is None:
-                    raise RuntimeError("Cannot find index row in ANY table (col[0]='1' + '4','7','13')")
-            else:
-                # Normal flow - found in table 1
-                self.logger.info(f"Table 1: Processed, header cut. Columns: year={cols[0]}, amount={cols[1]}, code={cols[2]}")
-                all_rows.extend(rows_1)
-
-                # Tables 2+ - use columns from table 1
-                for table_idx in range(2, len(tables)):
-                    rows_i, _ = self._extract_rows_for_processing(table_idx, tables[table_idx], fallback_cols=cols)
-                    all_rows.extend(rows_i)
-                    self.logger.info(f"Table {table_idx}: Added {len(rows_i)} rows")
-
-            # Parse data from rows
-            records, totals = self._parse_rows_data(all_rows)
-
-            self.logger.info(f"Extracted {len(records)} records and {len(totals)} 'Всього' rows")
+            self.logger.info("Extracted %d records and %d 'Всього' rows", len(records), len(totals))
 
             # Group and sum
             grouped_data = self._group_and_sum(records)
@@ -233,18 +232,40 @@ class IncomeStatementParser(BaseParser):
                 "verification": verification
             }
 
-            self.logger.info(f"Parsing completed. Found {len(grouped_data)} years")
+            self.logger.info("Parsing completed. Found %d years", len(grouped_data))
             return result
 
         except Exception as e:
-            self.logger.error(f"Parsing failed: {e}", exc_info=True)
+            self.logger.error("Parsing failed: %s", e, exc_info=True)
             return {
                 "success": False,
                 "error": str(e),
                 "data": {}
             }
 
-    def _parse_rows_data(self, all_rows: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    def warm_up(self) -> None:
+        """
+        Run the row patterns and translate table once, before the first request
+
+        One total row with a plain amount and one regular row whose amount
+        needs the regex, so the year, amount, total and code paths all run
+        """
+        self._parse_rows_data([
+            {
+                "year_cell": "2024",
+                "amount_cell": "1 000,00",
+                "code_cell": "",
+                "raw_row": {0: "Всього"}
+            },
+            {
+                "year_cell": "2024",
+                "amount_cell": "-5",
+                "code_cell": "101 - Заробітна плата",
+                "raw_row": {0: "1", 12: "101 - Заробітна плата"}
+            }
+        ])
+
+    def _parse_rows_data(self, all_rows: List[Dict]) -> Tuple[List[Record], List[Dict]]:
         """
         Parse rows data into records and totals
         Returns: (records list, totals list)
@@ -252,60 +273,63 @@ class IncomeStatementParser(BaseParser):
         records = []
         totals = []
 
+        # Bind hot-loop lookups to locals
+        year_search = _YEAR_RE.search
+        amount_search = _AMOUNT_RE.search
+        code_name_search = _CODE_NAME_RE.search
+        add_record = records.append
+        intern = sys.intern
+
         for row_data in all_rows:
             year_cell = row_data.get("year_cell", "")
             amount_cell = row_data.get("amount_cell", "")
             code_cell = row_data.get("code_cell", "")
             raw_row = row_data.get("raw_row", {})
 
-            # Check if this is a "Всього" row
-            is_total = any("всього" in str(val).lower() for val in raw_row.values())
-
-            if is_total:
-                # Extract for verification
-                year_match = re.search(r'\b(20\d{2})\b', year_cell)
-                if not year_match:
-                    continue
-                year = year_match.group(1)
-
-                amount_clean = amount_cell.replace(' ', '').replace(',', '.')
-                amount_match = re.search(r'(\d+\.?\d*)', amount_clean)
+            # Year and amount are read the same way for totals and regular rows;
+            # a plain substring test rejects empty and non-year cells before the regex
+            if "20" not in year_cell:
+                continue
+            year_match = year_search(year_cell)
+            if not year_match:
+                continue
+            # Years and codes come from a handful of values: intern them so
+            # records share strings and grouping keys compare by identity
+            year = intern(year_match.group(1))
+
+            # Plain "digits[.digits]" cells go straight to float(); anything else
+            # (signs, text, exponents, "inf") is read by the regex as before
+            amount_clean = amount_cell.translate(_AMOUNT_TT)
+            if amount_clean.isascii() and amount_clean[:1].isdigit() and amount_clean.replace(".", "", 1).isdigit():
+                amount = float(amount_clean)
+            else:
+                amount_match = amount_search(amount_clean)
                 if not amount_match:
                     continue
                 amount = float(amount_match.group(1))
 
+            # Check if this is a "Всього" row: one lower() over the joined cells
+            # instead of one per cell. Only "ь"/"Ь" lowercase to "ь", so rows
+            # without a soft sign are rejected without case-folding at all
+            row_text = "\n".join(raw_row.values())
+            if ("ь" in row_text or "Ь" in row_text) and "всього" in row_text.lower():
+                # Extract for verification
                 totals.append({
                     "year": year,
                     "amount": amount
                 })
                 continue
 
-            # Extract regular data
-            year_match = re.search(r'\b(20\d{2})\b', year_cell)
-            if not year_match:
-                continue
-            year = year_match.group(1)
-
-            amount_clean = amount_cell.replace(' ', '').replace(',', '.')
-            amount_match = re.search(r'(\d+\.?\d*)', amount_clean)
-            if not amount_match:
+            # Code and its name in one pass; empty cells never match
+            if not code_cell:
                 continue
-            amount = float(amount_match.group(1))
-
-            code_match = re.search(r'\b(\d{3})\b', code_cell)
+            code_match = code_name_search(code_cell)
             if not code_match:
                 continue
-            code = code_match.group(1)
+            code = intern(code_match.group(1))
+            name = (code_match.group(2) or "").strip()
 
-            name_match = re.search(r'\d{3}\s*-?\s*(.+)', code_cell)
-            name = name_match.group(1).strip() if name_match else ""
-
-            records.append({
-                "year": year,
-                "code": code,
-                "code_name": name,
-                "amount": amount
-            })
+            add_record(Record(year, code, name, amount))
 
         return records, totals
 
@@ -320,13 +344,19 @@ class IncomeStatementParser(BaseParser):
             "total_match": False
         }
 
-        # Verify by year
-        for year in sorted(grouped_data.keys()):
+        # First 'Всього' amount per year, and the sum of all of them
+        expected_by_year = {}
+        expected_grand_total = 0
+        for t in totals:
+            expected_by_year.setdefault(t["year"], t["amount"])
+            expected_grand_total += t["amount"]
+
+        # Verify by year (grouped_data is already sorted by year)
+        for year in grouped_data:
             our_total = grouped_data[year].get("_total", 0)
 
-            year_totals = [t for t in totals if t["year"] == year]
-            if year_totals:
-                expected = year_totals[0]["amount"]
+            expected = expected_by_year.get(year)
+            if expected is not None:
                 diff = abs(our_total - expected)
 
                 if diff < 1.0:
@@ -345,7 +375,6 @@ class IncomeStatementParser(BaseParser):
 
         # Verify grand total
         our_grand_total = sum(year_data.get("_total", 0) for year_data in grouped_data.values())
-        expected_grand_total = sum(t["amount"] for t in totals)
 
         verification["our_grand_total"] = our_grand_total
         verification["expected_grand_total"] = expected_grand_total
@@ -354,7 +383,7 @@ class IncomeStatementParser(BaseParser):
 
         return verification
 
-    def _group_and_sum(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _group_and_sum(self, records: List[Record]) -> Dict[str, Any]:
         """
         Group records by year and code, sum amounts
 
@@ -364,37 +393,41 @@ class IncomeStatementParser(BaseParser):
         Returns:
             Nested dictionary: {year: {code: {name, total}}}
         """
-        self.logger.info(f"Grouping and summing {len(records)} records")
-        grouped = defaultdict(lambda: defaultdict(lambda: {"name": "", "total": 0.0}))
-
-        for idx, record in enumerate(records):
-            year = record["year"]
-            code = record["code"]
-            amount = record["amount"]
-            code_name = record["code_name"]
-
-            grouped[year][code]["total"] += amount
-            if code_name and not grouped[year][code]["name"]:
-                grouped[year][code]["name"] = code_name
+        self.logger.info("Grouping and summing %d records", len(records))
+        # (year, code) -> [name, total]; nested only once at the end
+        acc: Dict[Tuple[str, str], List] = {}
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
+        for idx, (year, code, code_name, amount) in enumerate(records):
+            key = (year, code)
+            slot = acc.get(key)
+            if slot is None:
+                slot = acc[key] = [code_name, amount]
+            else:
+                slot[1] += amount
+                if code_name and not slot[0]:
+                    slot[0] = code_name
 
-            self.logger.debug(f"Record {idx}: {year}/{code} += {amount} (total now: {grouped[year][code]['total']})")
+            if debug:
+                self.logger.debug("Record %d: %s/%s += %s (total now: %s)",
+                                  idx, year, code, amount, slot[1])
 
-        # Convert to regular dict for JSON serialization
+        # Convert to nested dict for JSON serialization
         result = {}
-        for year in sorted(grouped.keys()):
+        for year, items in groupby(sorted(acc.items()), key=lambda item: item[0][0]):
             result[year] = {}
             year_total = 0.0
 
-            for code in sorted(grouped[year].keys()):
+            for (_, code), (name, total) in items:
                 result[year][code] = {
-                    "name": grouped[year][code]["name"],
-                    "amount": round(grouped[year][code]["total"], 2)
+                    "name": name,
+                    "amount": round(total, 2)
                 }
-                year_total += grouped[year][code]["total"]
+                year_total += total
 
             # Add year total
             result[year]["_total"] = round(year_total, 2)
-            self.logger.info(f"Year {year} total: {result[year]['_total']} грн ({len([k for k in result[year].keys() if k != '_total'])} codes)")
+            self.logger.info("Year %s total: %s грн (%d codes)", year, result[year]["_total"], len(result[year]) - 1)
 
         return result
 
@@ -453,55 +486,64 @@ class IncomeStatementParser(BaseParser):
 
             output.append("")
 
-            # Data for each year
-            for year in sorted(data.keys()):
+            # First match/mismatch per year, looked up once per year below
+            matches = {}
+            for m in verification.get("matches", []):
+                matches.setdefault(m["year"], m)
+            mismatches = {}
+            for m in verification.get("mismatches", []):
+                mismatches.setdefault(m["year"], m)
+
+            append = output.append
+            extend = output.extend
+
+            # Data for each year; _group_and_sum already emits years and codes sorted
+            for year in data:
                 year_data = data[year]
-                year_total = year_data.get("_total", 0)
 
-                output.append("─────────")
-                output.append(f"📆 {year} рік • Всього: {year_total:.2f} грн")
+                append("─────────")
+                append(f"📆 {year} рік • Всього: {year_data.get('_total', 0):.2f} грн")
 
                 # Year verification
-                year_match = [m for m in verification.get("matches", []) if m["year"] == year]
-                year_mismatch = [m for m in verification.get("mismatches", []) if m["year"] == year]
+                year_match = matches.get(year)
+                year_mismatch = mismatches.get(year)
 
                 if year_match:
-                    output.append(f"   ✅ Звірка: {year_match[0]['expected']:.2f} грн")
+                    append(f"   ✅ Звірка: {year_match['expected']:.2f} грн")
                 elif year_mismatch:
-                    output.append(f"   ⚠️ Звірка: {year_mismatch[0]['expected']:.2f} грн (різниця {year_mismatch[0]['diff']:.2f} грн)")
+                    append(f"   ⚠️ Звірка: {year_mismatch['expected']:.2f} грн (різниця {year_mismatch['diff']:.2f} грн)")
 
-                output.append("")
+                append("")
 
-                for code in sorted(year_data.keys()):
+                for code in year_data:
                     if code == "_total":
                         continue
-
                     code_info = year_data[code]
-                    name = code_info.get('name', '-')
-                    amount = code_info.get('amount', 0)
-
-                    output.append(f"🔹 Код {code}: {name}")
-                    output.append(f"   Сума: {amount:.2f} грн")
-                    output.append("")
+                    extend((
+                        f"🔹 Код {code}: {code_info.get('name', '-')}",
+                        f"   Сума: {code_info.get('amount', 0):.2f} грн",
+                        ""
+                    ))
 
             return "\n".join(output)
 
         except Exception as e:
-            self.logger.error(f"Formatting failed: {e}")
+            self.logger.error("Formatting failed: %s", e)
             return f"❌ Помилка форматування: {str(e)}"
 
-    def to_json(self, parsed_data: Dict[str, Any]) -> str:
+    def to_json(self, parsed_data: Dict[str, Any], *, pretty: bool = False) -> str:
         """
         Convert parsed data to JSON string
 
         Args:
             parsed_data: Parsed income data
+            pretty: Indent output for humans (default: compact)
 
         Returns:
             JSON string
         """
         try:
-            return json.dumps(parsed_data, ensure_ascii=False, indent=2)
+            return orjson.dumps(parsed_data, option=orjson.OPT_INDENT_2 if pretty else None).decode()
         except Exception as e:
-            self.logger.error(f"JSON conversion failed: {e}")
-            return json.dumps({"success": False, "error": str(e)})
+            self.logger.error("JSON conversion failed: %s", e)
+            return orjson.dumps({"success": False, "error": str(e)}).decode()
@@ -0,0 +1,85 @@
+"""
+On-disk cache helpers
+Cached files hold client documents, so they are private to the service user
+and expire after a TTL
+"""
+import os
+import shutil
+import threading
+import time
+from typing import BinaryIO, Dict, Pattern, Union
+
+# Expired entries are swept at most this often per cache directory (seconds)
+PRUNE_INTERVAL = 600
+
+_last_prune: Dict[str, float] = {}
+_prune_lock = threading.Lock()
+
+
+def make_private_dir(path: str) -> None:
+    """
+    Create directory (if missing) readable only by the service user
+
+    Existing directories are left as they are: a configured cache directory
+    may be shared with other files
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+
+
+def write_private_file(path: str, data: Union[bytes, BinaryIO]) -> None:
+    """
+    Atomically write a file readable only by the service user
+
+    Data goes to a temp file first so concurrent readers never see partial files
+
+    Args:
+        path: Destination path (directory must exist)
+        data: Bytes or a readable binary file object (copied from its current position)
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f, 1 << 16)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def is_expired(path: str, ttl: float) -> bool:
+    """True if the file was last written more than ttl seconds ago (raises if missing)"""
+    return time.time() - os.path.getmtime(path) > ttl
+
+
+def prune_expired(directory: str, ttl: float, path_re: Pattern[str]) -> None:
+    """
+    Delete cache files older than ttl seconds under directory
+
+    Only files whose path relative to directory ("/"-separated) fully
+    matches path_re are touched, so other files in a shared directory survive. Runs at most once per PRUNE_INTERVAL per
+    directory in this process; files that disappear or cannot be removed
+    are skipped
+    """
+    now = time.time()
+    with _prune_lock:
+        if now - _last_prune.get(directory, 0.0) < PRUNE_INTERVAL:
+            return
+        _last_prune[directory] = now
+
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if not path_re.fullmatch(os.path.relpath(path, directory).replace(os.sep, "/")):
+                continue
+            try:
+                if now - os.path.getmtime(path) > ttl:
+                    os.remove(path)
+            except OSError:
+                pass
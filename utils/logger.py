@@ -1,9 +1,29 @@
 """
 Logging configuration for the application
 """
+import atexit
 import logging
+import queue
 import sys
-from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+
+# All loggers enqueue records; one background listener writes them to stdout,
+# so request threads never wait on the stream handler lock or on I/O
+_log_queue = queue.Queue(-1)
+
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(logging.Formatter(
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+))
+
+_listener = QueueListener(_log_queue, _stream_handler)
+_listener.start()
+atexit.register(_listener.stop)
+
+# Logger name -> level it was configured with
+_configured = {}
 
 
 def setup_logger(name: str = __name__, level: str = "INFO") -> logging.Logger:
@@ -21,24 +41,23 @@ def setup_logger(name: str = __name__, level: str = "INFO") -> logging.Logger:
 
     # Set level
     log_level = getattr(logging, level.upper(), logging.INFO)
+
+    # Already configured the same way (e.g. by module import and by __init__)
+    if _configured.get(name) == log_level:
+        return logger
+
     logger.setLevel(log_level)
 
     # Remove existing handlers
     logger.handlers = []
 
-    # Create console handler with formatting
-    handler = logging.StreamHandler(sys.stdout)
+    # Hand records to the background listener
+    handler = QueueHandler(_log_queue)
     handler.setLevel(log_level)
 
-    # Create formatter
-    formatter = logging.Formatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    handler.setFormatter(formatter)
-
     # Add handler to logger
     logger.addHandler(handler)
+    _configured[name] = log_level
 
     return logger
 